@@ -12,11 +12,13 @@ A top level result is created containing metadata about the overall test.
 The example sweeps across a range of input currents and voltages and takes measurements
 for each combination and stores a single measurement within each test step.  The test
 steps are associated with the test result, and in some cases, as child relationships
-to other test steps.  Each step is uploaded to the SystemLink Enterprise as it is generated.
-At the end, the step status is evaluated to set the status of the parent step and
-ultimately sets the status of the top-level test result.
+to other test steps.  The child steps of each sweep are uploaded to the SystemLink Enterprise
+together in a single request, and the sweeps are uploaded concurrently.
+The status of each parent step is evaluated locally from its child steps, and at the end
+the parent steps and the top-level test result are updated with their final status once.
 """
 
+import asyncio
 import random
 import os
 import sys
@@ -24,6 +26,7 @@ import uuid
 import datetime
 from typing import Tuple, Dict, List
 import click
+import httpx
 
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
@@ -31,16 +34,20 @@ sys.path.append(parent)
 
 import test_data_manager_client
 
-def measure_power(current: float, voltage: float = 0) -> Tuple[float, List[Dict], List[Dict]]:
+# Number of voltages measured in each sweep.
+voltage_count = 10
+
+
+def measure_power(current: float, voltage: float, current_loss: float, voltage_loss: float) -> Tuple[float, List[Dict], List[Dict]]:
     """
     Simulates taking an electrical power measurement.
-    This introduces some random current and voltage loss.
+    This introduces the given current and voltage loss.
     :param current: The electrical current value.
     :param voltage: The electrical voltage value.
+    :param current_loss: The factor of the current remaining after the loss.
+    :param voltage_loss: The factor of the voltage remaining after the loss.
     :return: A tuple containing the electrical power measurements and the input and output lists.
     """
-    current_loss = 1 - random.uniform(0, 1) * 0.25
-    voltage_loss = 1 - random.uniform(0, 1) * 0.25
     power = current * current_loss * voltage * voltage_loss
 
     # Record electrical current and voltage as inputs.
@@ -52,23 +59,23 @@ def measure_power(current: float, voltage: float = 0) -> Tuple[float, List[Dict]
     return power, inputs, outputs
 
 
-def build_power_measurement_params(power: float, low_limit: float, high_limit: float, status: Dict) -> Dict:
+def build_power_measurement_params(power: float, low_limit: str, high_limit: str, status: Dict) -> Dict:
     """
     Builds a Test Monitor measurement parameter object for the power test.
     :param power: The electrical power measurement.
-    :param low_limit: The value of the low limit for the test.
-    :param high_limit: The value of the high limit for the test.
+    :param low_limit: The text of the low limit value for the test.
+    :param high_limit: The text of the high limit value for the test.
     :param status: The measurement's pass/fail status.
     :return: A list of test measurement parameters.
     """
     parameter = {
         "name": "Power Test",
-        "status": str(status["statusType"]),
+        "status": status["statusType"],
         "measurement": str(power),
         "units": "Watts",
         "nominalValue": None,
-        "lowLimit": str(low_limit),
-        "highLimit": str(high_limit),
+        "lowLimit": low_limit,
+        "highLimit": high_limit,
         "comparisonType": "GELE"
     }
 
@@ -85,40 +92,74 @@ def is_partial_success_response(response: Dict) -> bool:
     return "error" in response.keys()
 
 
-def create_result() -> Dict:
+def create_result_and_parent_steps(count: int) -> Tuple[Dict, List[Dict]]:
+    started_at = datetime.datetime.utcnow().isoformat()
     test_result = test_data_manager_client.create_test_result(
         program_name = "Power Test", 
         part_number = "NI-ABC-123-PWR", 
         operator = "John Doe", 
         serial_number = str(uuid.uuid4()), 
-        started_at = str(datetime.datetime.utcnow())
+        started_at = started_at
     )
-
-    response = test_data_manager_client.create_results(results=[test_result])
-    if is_partial_success_response(response) :
+    # Generate the parent steps, each representing a sweep of voltages at a given current.
+    # The result ID is set on them once the test result is created.
+    voltage_sweep_steps_data = [
+        test_data_manager_client.create_test_step(
+            name = "Voltage Sweep", 
+            step_type = "SequenceCall", 
+            started_at = started_at,
+            result_id = None
+        )
+        for _ in range(count)
+    ]
+
+    # Create the test result and all its parent steps on the SystemLink Enterprise together.
+    results_response, steps_response = test_data_manager_client.create_result_with_steps(
+        result=test_result, 
+        steps=voltage_sweep_steps_data
+    )
+    if is_partial_success_response(results_response) :
         raise Exception("Error occurred while creating the new test result. Please check if you have provided the correct test result details and if you have the right access for creating the new test result")
-    test_result = response["results"][0]
+    test_result = results_response["results"][0]
     print(f"New test result is created under part number = {test_result['partNumber']} with ID = {test_result['id']}")
-    
-    return test_result
 
+    if is_partial_success_response(steps_response):
+        raise Exception("Error occurred while creating the parent steps, please check if you have provided the correct step details and if you have right access for creating the steps.")
+    steps = steps_response["steps"]
+    for step in steps:
+        print(f"New parent step is created with step ID = {step['stepId']} under result with ID = {step['resultId']}")
 
-def update_result(test_result: Dict) -> None:
+    return test_result, steps
+
+
+def update_result(test_result: Dict, voltage_sweep_steps: List[Dict]) -> None:
+    # The top-level test result's status is the most severe status of its sweeps.
+    any_failed = any(step["status"] is test_data_manager_client.failed_status for step in voltage_sweep_steps)
+    set_step_status(test_result, "Failed" if any_failed else "Passed")
 
     # If we include the workspace in the update result request, the privileges required to perform the update operation
     # is to delete the existing test result and to create a new test result for that workspace. 
     # Sometimes the clients via system management do not have delete permissions, at that time they will get 404 unauthorized error.
     # To deal with this situation we are removing the workspace field from the request body.
     remove_if_key_exists(dict=test_result, key="workspace")
-    response = test_data_manager_client.update_results(results=[test_result])
-    if is_partial_success_response(response):
+
+    # Update the test result and the status of its parent steps on the SystemLink enterprise together.
+    results_response, steps_response = test_data_manager_client.update_results_and_steps(
+        results=[test_result], 
+        steps=voltage_sweep_steps
+    )
+    if is_partial_success_response(steps_response):
+        print("Error occurred while updating the parent steps. Please check if you have provided the correct step details and if you have right access for updating the steps.")
+    for parent_step in steps_response.get("steps", []):
+        print(f"The parent step with step ID = {parent_step['stepId']} is updated successfully")
+    if is_partial_success_response(results_response):
         print("Error occurred while updating the test result, please check if you have provided the correct test result details and if you have the right access for updating the test result")
     else:
-        test_result = response["results"][0]
+        test_result = results_response["results"][0]
         print(f"Test result with ID = {test_result['id']} is updated successfully")
 
 
-def create_steps(test_result: Dict) -> None:
+async def create_steps(test_result: Dict, voltage_sweep_steps: List[Dict]) -> List[Dict]:
     # Set test limits
     low_limit = 0
     high_limit = 70
@@ -127,107 +168,103 @@ def create_steps(test_result: Dict) -> None:
     Simulate a sweep across a range of electrical current and voltage.
     For each value, calculate the electrical power (P=IV).
     """
-    for current in range(0, 10):
-        voltage_sweep_step = create_parent_step(test_result["id"])
-        create_child_steps(voltage_sweep_step, test_result["id"], current, low_limit, high_limit)
+    # Draw the random current and voltage losses and the step times of all the measurements up front.
+    sweep_count = len(voltage_sweep_steps)
+    current_losses = [[1 - random.uniform(0, 1) * 0.25 for _ in range(voltage_count)] for _ in range(sweep_count)]
+    voltage_losses = [[1 - random.uniform(0, 1) * 0.25 for _ in range(voltage_count)] for _ in range(sweep_count)]
+    total_times = [[random.uniform(0, 1) * 10 for _ in range(voltage_count)] for _ in range(sweep_count)]
+
+    # The sweeps are independent of each other, so the child steps of a sweep are uploaded
+    # over a shared client while the next sweeps are measured.  The client's connection pool
+    # limits the number of uploads in flight.
+    async with test_data_manager_client.create_async_client() as client:
+        uploads = []
+        for current, voltage_sweep_step in enumerate(voltage_sweep_steps):
+            child_steps = measure_voltage_sweep(
+                voltage_sweep_step, test_result["id"], current, 
+                current_losses[current], voltage_losses[current], total_times[current], low_limit, high_limit
+            )
+            uploads.append(asyncio.create_task(create_child_steps(client, child_steps)))
+            # Let the upload start before measuring the next sweep.
+            await asyncio.sleep(0)
+        await asyncio.gather(*uploads)
 
+    return voltage_sweep_steps
 
-def update_step_status(step: Dict, status: str) -> Dict:
+
+def set_step_status(step: Dict, status: str) -> None:
     """
-    Updates step status based on the given status
+    Sets step status based on the given status
     :param step: represents step which needs to be updated
     :param status: string representing the current status of the step
-    :return: Update steps API response
     """
     if(status == "Passed"):
-        step["status"] = {
-            "statusType": "PASSED",
-            "statusName": "Passed"
-        }
+        step["status"] = test_data_manager_client.passed_status
     elif(status == "Failed"):
-        step["status"] = {
-            "statusType": "FAILED",
-            "statusName": "Failed"
-        }
-    # Update the test step's status on the SystemLink enterprise.
-    response = test_data_manager_client.update_steps(steps=[step])
-    return response
-
-
-def create_parent_step(result_id: str) -> Dict:
-    # Generate a parent step to represent a sweep of voltages at a given current.
-    voltage_sweep_step_data = test_data_manager_client.create_test_step(
-        name = "Voltage Sweep", 
-        step_type = "SequenceCall", 
-        result_id = result_id
-    )
-    # Create the step on the SystemLink Enterprise.
-    response = test_data_manager_client.create_steps(steps=[voltage_sweep_step_data])
-    if is_partial_success_response(response):
-        raise Exception("Error occurred while creating the parent step, please check if you have provided the correct step details and if you have right access for creating the steps.")
-    step = response["steps"][0]
-    print(f"New parent step is created with step ID = {step['stepId']} under result with ID = {step['resultId']}")
-    return step
-
-
-def create_child_steps(parent_step: Dict, result_id: str, current: float, low_limit: float, high_limit: float) -> Dict:
-    for voltage in range(0, 10):
-            # Simulate obtaining a power measurement.
-            power, inputs, outputs = measure_power(current, voltage)
-
-            # Test the power measurement.
-            if power < low_limit or power > high_limit:
-                status = {
-                    "statusType": "FAILED",
-                    "statusName": "Failed"
-                }
-            else:
-                status = {
-                    "statusType": "PASSED",
-                    "statusName": "Passed"
-                }
-            test_parameters = build_power_measurement_params(power, low_limit, high_limit, status)
-
-            # Generate a child step to represent the power output measurement.
-            measure_power_output_step_data = test_data_manager_client.create_test_step(
-                name = "Measure Power Output", 
-                step_type = "NumericLimit", 
-                inputs = inputs, 
-                outputs = outputs, 
-                parameters = test_parameters, 
-                status = status,
-                result_id = result_id,
-                parent_id = parent_step["stepId"],
-                keywords= ["keyword1", "keyword2"],
-                properties={"key1": "value1", "key2": "value2"}
-            )
-            # Create the step on the SystemLink enterprise.
-            response = test_data_manager_client.create_steps(steps=[measure_power_output_step_data])
-            if is_partial_success_response(response):
-                print("Error occurred while creating the child step, please check if you have provided the correct step details and if you have the right access for creating the step")
-            else:
-                measure_power_output_step = response["steps"][0]
-                print(f"New child step is created with step ID = {measure_power_output_step['stepId']} under step with step ID = {measure_power_output_step['parentId']}")
-
-            # If a test in the sweep fails, the entire sweep failed.  Mark the parent step accordingly.
-            if status["statusType"] == "FAILED":
-                # Update the parent test step's status on the SystemLink enterprise.
-                response = update_step_status(parent_step, "Failed")
-                if is_partial_success_response(response):
-                    print("Error occurred while updating the parent step. Please check if you have provided the correct step details and if you have right access for updating the steps.")
-                else:
-                    parent_step = response["steps"][0]
-                    print(f"The parent step with step ID = {parent_step['stepId']} is updated successfully")
-    
-    # Update the step status if the status is still running.
-    if parent_step["status"]["statusType"] == "RUNNING":
-        response = update_step_status(parent_step, "Passed")
-        if is_partial_success_response(response):
-            print("Error occurred while updating the parent step. Please check if you have provided the correct step details and if you have right access for updating the steps.")
+        step["status"] = test_data_manager_client.failed_status
+
+
+def measure_voltage_sweep(
+    parent_step: Dict, 
+    result_id: str, 
+    current: float, 
+    current_losses: List[float], 
+    voltage_losses: List[float], 
+    total_times: List[float], 
+    low_limit: float, 
+    high_limit: float
+) -> List[Dict]:
+    # The limits and the start time are the same for every step of the sweep.
+    low_limit_text = str(low_limit)
+    high_limit_text = str(high_limit)
+    started_at = datetime.datetime.utcnow().isoformat()
+
+    # Simulate the whole voltage sweep first so that its child steps can be created in a single request.
+    child_steps = []
+    sweep_status = "Passed"
+    for voltage in range(0, voltage_count):
+        # Simulate obtaining a power measurement.
+        power, inputs, outputs = measure_power(current, voltage, current_losses[voltage], voltage_losses[voltage])
+
+        # Test the power measurement.
+        if power < low_limit or power > high_limit:
+            status = test_data_manager_client.failed_status
+            # If a test in the sweep fails, the entire sweep failed.
+            sweep_status = "Failed"
         else:
-            parent_step = response["steps"][0]
-            print(f"The parent step with step ID = {parent_step['stepId']} is updated successfully")
-    return parent_step
+            status = test_data_manager_client.passed_status
+        test_parameters = build_power_measurement_params(power, low_limit_text, high_limit_text, status)
+
+        # Generate a child step to represent the power output measurement.
+        measure_power_output_step_data = test_data_manager_client.create_test_step(
+            name = "Measure Power Output", 
+            step_type = "NumericLimit", 
+            inputs = inputs, 
+            outputs = outputs, 
+            parameters = test_parameters, 
+            status = status,
+            total_time_in_seconds = total_times[voltage],
+            started_at = started_at,
+            result_id = result_id,
+            parent_id = parent_step["stepId"],
+            keywords= ["keyword1", "keyword2"],
+            properties={"key1": "value1", "key2": "value2"}
+        )
+        child_steps.append(measure_power_output_step_data)
+
+    # Mark the parent step with the status of the sweep.
+    # The parent step is updated on the SystemLink enterprise along with the test result.
+    set_step_status(parent_step, sweep_status)
+    return child_steps
+
+
+async def create_child_steps(client: httpx.AsyncClient, child_steps: List[Dict]) -> None:
+    # Create all the child steps of the sweep on the SystemLink enterprise.
+    response = await test_data_manager_client.create_steps_async(client, steps=child_steps)
+    if is_partial_success_response(response):
+        print("Error occurred while creating the child steps, please check if you have provided the correct step details and if you have the right access for creating the steps")
+    for measure_power_output_step in response.get("steps", []):
+        print(f"New child step is created with step ID = {measure_power_output_step['stepId']} under step with step ID = {measure_power_output_step['parentId']}")
 
 
 @click.command()
@@ -245,12 +282,12 @@ def main(server, api_key):
     test_data_manager_client.set_base_url_and_api_key(server, api_key)
 
     try:
-        test_result = create_result()
+        test_result, voltage_sweep_steps = create_result_and_parent_steps(10)
 
-        create_steps(test_result)
+        voltage_sweep_steps = asyncio.run(create_steps(test_result, voltage_sweep_steps))
         
         # Update the top-level test result's status based on the most severe child step's status.
-        update_result(test_result)
+        update_result(test_result, voltage_sweep_steps)
         
     except Exception as e:
         print(e)
@@ -1,8 +1,14 @@
 import random
 import uuid
 import datetime
+import gzip
 import requests
-from typing import Dict, List
+import httpx
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 create_results_route = "nitestmonitor/v2/results"
 create_steps_route = "nitestmonitor/v2/steps"
@@ -16,6 +22,42 @@ base_url = ""
 
 headers = { 'X-NI-API-KEY': api_key }
 
+# The step and result statuses never change, so every step and result shares the same status objects.
+running_status = { "statusType": "RUNNING", "statusName": "Running" }
+passed_status = { "statusType": "PASSED", "statusName": "Passed" }
+failed_status = { "statusType": "FAILED", "statusName": "Failed" }
+
+# Every step starts from a copy of this template, so only the fields which are given need to be set.
+step_template = {
+    "stepId": None,
+    "parentId": None,
+    "resultId": None,
+    "children": None,
+    "data": None,
+    "dataModel": "TestStand",
+    "name": "",
+    "startedAt": None,
+    "status": running_status,
+    "stepType": "",
+    "totalTimeInSeconds": 0.0,
+    "inputs": None,
+    "outputs": None,
+    "keywords": None,
+    "properties": None
+}
+
+# Set to True to gzip compress request bodies larger than compression_threshold bytes.
+# Only enable it when the server accepts gzip encoded request bodies.
+compress_requests = False
+compression_threshold = 1024
+
+# Maximum number of pooled connections, and so of requests in flight at once, to the server.
+max_connections = 20
+
+# Share one pooled session across all the requests so that connections are kept alive and reused.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=Retry(total=3, backoff_factor=0.2)))
+
 def update_headers() -> None:
     global headers, api_key
     headers = { 'X-NI-API-KEY': api_key }
@@ -26,6 +68,19 @@ def set_base_url_and_api_key(server_url: str, key: str) -> None:
     api_key = key
     update_headers()
 
+def create_async_client() -> httpx.AsyncClient:
+    """
+    Creates an asynchronous HTTP client for the current server and API key.
+    The client pools its connections, so a single instance should be shared
+    by all the concurrent requests of a run.
+    :return: The asynchronous HTTP client
+    """
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=None,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+
 def create_test_result(
         program_name: str = "Power Test", 
         part_number: str = "NI-ABC-123-PWR",
@@ -53,10 +108,7 @@ def create_test_result(
     :param status: The test result's status
     :return: The result data used to create a test result.
     """
-    result_status = status if status else {
-        "statusType": "RUNNING",
-        "statusName": "Running"
-        }
+    result_status = status if status else running_status
 
     test_result = {
         "programName": program_name,
@@ -86,6 +138,8 @@ def create_test_step(
     status: Dict = None,
     keywords: List[str] = None,
     properties: Dict[str, str] = None,
+    total_time_in_seconds: float = None,
+    started_at: str = None,
 ) -> Dict:
     """
     Creates the step data and
@@ -98,30 +152,32 @@ def create_test_step(
     :param status: The test step's status.
     :param keywords: The test steps's keywords.
     :param properties: The test steps's properties.
+    :param total_time_in_seconds: The test step's total time, a random time is used if not given.
+    :param started_at: The test step's start time, the current time is used if not given.
     :return: The step data used to create a test step.
     """
-    step_status = status if status else {
-        "statusType": "RUNNING",
-        "statusName": "Running"
-        }
-
-    step_data = {
-        "stepId": None,
-        "parentId": parent_id,
-        "resultId": result_id,
-        "children": children,
-        "data": parameters,
-        "dataModel": "TestStand",
-        "name": name,
-        "startedAt":  str(datetime.datetime.utcnow()),
-        "status": step_status,
-        "stepType": step_type,
-        "totalTimeInSeconds": random.uniform(0, 1) * 10,
-        "inputs": inputs,
-        "outputs": outputs,
-        "keywords": keywords,
-        "properties": properties
-    }
+    step_data = step_template.copy()
+    step_data["name"] = name
+    step_data["stepType"] = step_type
+    step_data["resultId"] = result_id
+    step_data["startedAt"] = started_at if started_at else datetime.datetime.utcnow().isoformat()
+    step_data["totalTimeInSeconds"] = total_time_in_seconds if total_time_in_seconds is not None else random.uniform(0, 1) * 10
+    if status:
+        step_data["status"] = status
+    if parent_id is not None:
+        step_data["parentId"] = parent_id
+    if children is not None:
+        step_data["children"] = children
+    if parameters is not None:
+        step_data["data"] = parameters
+    if inputs is not None:
+        step_data["inputs"] = inputs
+    if outputs is not None:
+        step_data["outputs"] = outputs
+    if keywords is not None:
+        step_data["keywords"] = keywords
+    if properties is not None:
+        step_data["properties"] = properties
 
     return step_data
 
@@ -186,15 +242,38 @@ def create_results(results: List) -> Dict:
 
     return request_response.json()
 
-def update_results(results: List) -> Dict:
+def create_result_with_steps(result: Dict, steps: List) -> Tuple[Dict, Dict]:
+    """
+    Creates a new test result along with test steps associated with it.
+    The Test Monitor service has no endpoint creating both at once, so the result is created first
+    and the resulting ID is set on the steps before they are created over the pooled session.
+    :param result: Result to be created
+    :param steps: Steps to be created under the result
+    :return: json responses after creating the result and the steps
+    """
+    if len(steps) == 0 :
+        raise ValueError("Number of steps to be created can not be empty.")
+    results_response = create_results([result])
+    if "error" in results_response.keys():
+        return results_response, {}
+    result_id = results_response["results"][0]["id"]
+    for step in steps:
+        step["resultId"] = result_id
+    steps_response = create_steps(steps)
+
+    return results_response, steps_response
+
+def update_results(results: List, determine_status_from_steps: bool = True) -> Dict:
     """
     Updates existing test results by merging or replacing values.
     :param results: List of results to be updated
+    :param determine_status_from_steps: A boolean to determine if the result status needs to be updated 
+    based on the status of the steps
     :return: json response after updating the results
     """
     if len(results) == 0 :
         raise ValueError("Number of results to be updated can not be empty.")
-    body = update_test_results_request(results, determine_status_from_steps = True)
+    body = update_test_results_request(results, determine_status_from_steps = determine_status_from_steps)
     request_url = base_url + update_results_route
     request_response = raise_post_request(request_url, body)
 
@@ -234,6 +313,46 @@ def update_steps(steps: List) -> Dict:
 
     return request_response.json()
 
+def update_results_and_steps(results: List, steps: List) -> Tuple[Dict, Dict]:
+    """
+    Updates existing test results and steps.
+    The two update requests are independent, so they are made in parallel over the pooled session.
+    The results are updated with the status they are given, as it can not be determined
+    from steps which are still being updated. Their total time is left to the steps update,
+    which updates it on the server.
+    :param results: List of results to be updated
+    :param steps: List of steps to be updated
+    :return: json responses after updating the results and the steps
+    """
+    # A total time sent with the results would race with the one set by the steps update.
+    results = [
+        {key: value for key, value in result.items() if key != "totalTimeInSeconds"}
+        for result in results
+    ]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results_future = executor.submit(update_results, results, False)
+        steps_future = executor.submit(update_steps, steps)
+        return results_future.result(), steps_future.result()
+
+async def create_steps_async(client: httpx.AsyncClient, steps: List) -> Dict:
+    """
+    Asynchronously creates new test steps from the supplied models.
+    The result associated with the steps must exist prior to step creation.
+    The server automatically generates step IDs if not provided.
+    :param client: Asynchronous HTTP client used to make the request
+    :param steps: Steps to be created
+    :return: json response after creating steps
+    """
+    if len(steps) == 0 :
+        raise ValueError("Number of steps to be created can not be empty.")
+    body = test_step_create_or_update_request_object(
+        steps, update_result_total_time = True
+    )
+    request_url = base_url + create_steps_route
+    request_response = await raise_post_request_async(client, request_url, body)
+
+    return request_response.json()
+
 def delete_result(result_id: str, delete_steps: bool = True) -> None:
     """
     Deletes test result.
@@ -260,6 +379,23 @@ def delete_results(result_ids: List, delete_steps: bool = True) -> Dict:
     else:
         return {}
 
+def encode_request_body(body: Dict) -> Tuple[bytes, Dict]:
+    """
+    Serializes the body of a request to JSON.
+    Large bodies, such as batches of steps, are gzip compressed if compress_requests is enabled.
+    The server must support gzip encoded request bodies for this.
+    :param body: API call body
+    :return: A tuple containing the serialized body and the headers describing it
+    """
+    content = orjson.dumps(body)
+    content_headers = { 'Content-Type': 'application/json' }
+    if compress_requests and len(content) > compression_threshold:
+        # The lowest compression level is cheap and already shrinks the repeated field names well.
+        content = gzip.compress(content, compresslevel=1)
+        content_headers['Content-Encoding'] = 'gzip'
+
+    return content, content_headers
+
 def raise_post_request(url: str, body: Dict) -> requests.Response:
     """
     Makes the post request API call.
@@ -267,7 +403,22 @@ def raise_post_request(url: str, body: Dict) -> requests.Response:
     :param body: API call body
     :return: response of the API call
     """
-    request_response =  requests.post(url, json=body, headers=headers)
+    content, content_headers = encode_request_body(body)
+    request_response = session.post(url, data=content, headers={ **headers, **content_headers })
+    request_response.raise_for_status()
+
+    return request_response
+
+async def raise_post_request_async(client: httpx.AsyncClient, url: str, body: Dict) -> httpx.Response:
+    """
+    Makes the post request API call asynchronously.
+    :param client: Asynchronous HTTP client used to make the request
+    :param url: request url to be called
+    :param body: API call body
+    :return: response of the API call
+    """
+    content, content_headers = encode_request_body(body)
+    request_response = await client.post(url, content=content, headers=content_headers)
     request_response.raise_for_status()
 
     return request_response
@@ -278,7 +429,7 @@ def raise_delete_request(url: str) -> requests.Response:
     :param url: request url to be called
     :return: response of the API call
     """
-    request_response = requests.delete(url, headers=headers)
+    request_response = session.delete(url, headers=headers)
     request_response.raise_for_status()
 
     return request_response
\ No newline at end of file